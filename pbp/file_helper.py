@@ -97,18 +97,23 @@ class SoundStatus:
         return sound_filename
 
     def remove_downloaded_file(self):
-        if not pathlib.Path(self.sound_filename).exists():
+        if self.sound_filename is None:
             return
 
         if (
             self.s3_client is None and self.gs_client is None
         ) or self.parsed_uri.scheme not in ("s3", "gs"):
-            self.log.debug(f"No file download involved for {self.uri=}")
+            self.log.debug("No file download involved for uri={!r}", self.uri)
             return
 
+        # Just attempt the removal instead of a separate existence check:
         try:
             os.remove(self.sound_filename)
-            self.log.debug(f"Removed cached file {self.sound_filename} for {self.uri=}")
+            self.log.debug(
+                "Removed cached file {} for uri={!r}", self.sound_filename, self.uri
+            )
+        except FileNotFoundError:
+            pass
         except OSError as e:
             self.log.error(f"Error removing file {self.sound_filename}: {e}")
 
@@ -137,7 +142,7 @@ def _download(
     bucket, key, simple = get_bucket_key_simple(parsed_uri)
     local_filename = f"{download_dir}/{simple}"
 
-    if os.path.isfile(local_filename) and assume_downloaded_files:
+    if assume_downloaded_files and os.path.isfile(local_filename):
         log.info(f"ASSUMING ALREADY DOWNLOADED: {bucket=} {key=} to {local_filename}")
         return local_filename
 
@@ -387,7 +392,10 @@ class FileHelper:
                 return None
 
             self.log.debug(
-                f"    {prefix} {intersection.duration_secs} secs from {ss.sound_filename}"
+                "    {} {} secs from {}",
+                prefix,
+                intersection.duration_secs,
+                ss.sound_filename,
             )
 
             if audio_info is not None and not self._check_audio_info(
@@ -457,14 +465,14 @@ class FileHelper:
         :param uri:
         :return:
         """
-        self.log.debug(f"_get_sound_status: {uri=}")
+        self.log.debug("_get_sound_status: uri={!r}", uri)
         ss = self.sound_cache.get(uri)
         if ss is None:
             # currently cached ones get a bit older:
             for c_ss in self.sound_cache.values():
                 c_ss.age += 1
 
-            self.log.debug(f"SoundStatus: creating for {uri=}")
+            self.log.debug("SoundStatus: creating for uri={!r}", uri)
             ss = SoundStatus(
                 log=self.log,
                 uri=uri,
@@ -478,7 +486,7 @@ class FileHelper:
             )
             self.sound_cache[uri] = ss
         else:
-            self.log.debug(f"SoundStatus: already available for {uri=}")
+            self.log.debug("SoundStatus: already available for uri={!r}", uri)
 
         # close and remove files in the cache that are not fresh enough in terms
         # of not being recently used
@@ -8,8 +8,6 @@ from loguru import logger as log
 import numpy as np
 import pandas as pd
 from pathlib import Path
-import shutil
-import tempfile
 import json
 
 
@@ -40,47 +38,50 @@ class MetadataCorrector:
         self.day = day
         self.variable_duration = variable_duration
         self.seconds_per_file = seconds_per_file
+        self._file_duration = np.timedelta64(timedelta(seconds=seconds_per_file))
 
     def run(self):
         """Run the corrector"""
 
         try:
+            # the day window is located by binary search on the start times
+            correct_df = self.correct_df
+            if not correct_df["start"].is_monotonic_increasing:
+                correct_df = correct_df.sort_values(by=["start"], kind="stable")
+            starts = correct_df["start"]
+            day_end = self.day + timedelta(days=1)
+
             if self.variable_duration:
                 files_per_day = None
                 # Filter the metadata to the day, starting 6 hours before the day starts to capture overlap
-                df = self.correct_df[
-                    (self.correct_df["start"] >= self.day - timedelta(hours=6))
-                    & (self.correct_df["start"] < self.day + timedelta(days=1))
-                ]
+                lo, hi = starts.searchsorted([self.day - timedelta(hours=6), day_end])
+                df = correct_df.iloc[lo:hi]
             else:  # files are fixed, but may be missing or incomplete if the system was down
                 files_per_day = int(86400 / self.seconds_per_file)
-                # Filter the metadata to the day, starting 1 file before the day starts to capture overlap
-                df = self.correct_df[
-                    (
-                        (self.correct_df["start"] >= self.day)
-                        & (self.correct_df["start"] < self.day + timedelta(days=1))
-                    )
-                    | (
-                        (self.correct_df["end"] >= self.day)
-                        & (self.correct_df["start"] < self.day)
-                    )
-                ]
+                # Filter the metadata to the day, including any files starting before the day
+                # that extend into it to capture overlap
+                lo, hi = starts.searchsorted([self.day, day_end])
+                df = correct_df.iloc[lo:hi]
+                before = correct_df.iloc[:lo]
+                overlapping = before["end"] >= self.day
+                if overlapping.any():
+                    df = pd.concat([before[overlapping], df], axis=0)
 
-            log.debug(f"Creating metadata for day {self.day}")
+            log.debug("Creating metadata for day {}", self.day)
 
             if len(df) == 0:
                 log.warning(f"No metadata found for day {self.day}")
                 return
 
-            # convert the start and end times to datetime
-            df = df.copy()
-
-            df["start"] = pd.to_datetime(df["start"])
-            df["end"] = pd.to_datetime(df["end"])
+            # convert the start and end times to datetime, explicitly as UTC
+            df = df.assign(
+                start=pd.to_datetime(df["start"], utc=True),
+                end=pd.to_datetime(df["end"], utc=True),
+            )
 
             # get the file list that covers the requested day
             log.info(
-                f'Found {len(df)} files from day {self.day}, starting {df.iloc[0]["start"]} ending {df.iloc[-1]["end"]}'
+                f'Found {len(df)} files from day {self.day}, starting {df["start"].iat[0]} ending {df["end"].iat[-1]}'
             )
 
             # if there are no files, then return
@@ -90,18 +91,27 @@ class MetadataCorrector:
 
             day_process = df
 
+            # local files are given by url, otherwise by uri
+            uri_column = "uri" if "uri" in day_process.columns else "url"
+
             if self.variable_duration:
                 log.info(f"Files for {self.day} are variable. Skipping duration check")
-                for index, row in day_process.iterrows():
-                    log.debug(f'File {row["uri"]} duration {row["duration_secs"]} ')
+                for uri, duration_secs in zip(
+                    day_process[uri_column], day_process["duration_secs"]
+                ):
+                    log.debug("File {} duration {} ", uri, duration_secs)
             else:
-                for index, row in day_process.iterrows():
-                    # if the duration_secs is not seconds per file, then the file is not complete
-                    if row["duration_secs"] != self.seconds_per_file:
-                        log.warning(
-                            f'File {row["duration_secs"]}  != {self.seconds_per_file}. File is not complete'
-                        )
-                        continue
+                # if the duration_secs is not seconds per file, then the file is not complete
+                incomplete = (
+                    day_process["duration_secs"].to_numpy() != self.seconds_per_file
+                )
+                for uri, duration_secs in zip(
+                    day_process.loc[incomplete, uri_column],
+                    day_process.loc[incomplete, "duration_secs"],
+                ):
+                    log.warning(
+                        f"File {uri} duration {duration_secs} != {self.seconds_per_file}. File is not complete"
+                    )
 
             # check whether there is a discrepancy between the number of seconds in the file and the number
             # of seconds in the metadata. If there is a discrepancy, then correct the metadata
@@ -109,9 +119,8 @@ class MetadataCorrector:
             day_process["jitter_secs"] = 0
 
             if self.variable_duration or (
-                len(day_process) == files_per_day + 1
-                and len(day_process["duration_secs"].unique()) == 1
-                and day_process.iloc[0]["duration_secs"] == self.seconds_per_file
+                # all files complete, as determined by the duration check above
+                len(day_process) == files_per_day + 1 and not incomplete.any()
             ):
                 # check whether the differences are all the same
                 if (
@@ -122,50 +131,41 @@ class MetadataCorrector:
                 else:
                     log.info(f"Correcting drift for {self.day}")
 
-                    # correct the metadata
-                    jitter = 0
-                    start = day_process.iloc[0]["start"]
-                    end = start + timedelta(seconds=self.seconds_per_file)
-
-                    for index, row in day_process.iterrows():
-                        # jitter is the difference between the expected start time and the actual start time
-                        # jitter is 0 for the first file
-                        if row.start == start:
-                            # round the jitter to the nearest second
-                            jitter = start.to_datetime64() - row.start.to_datetime64()
-                            jitter = int(jitter / np.timedelta64(1, "s"))
-
-                        # correct the start and end times
-                        day_process.loc[index, "start"] = start
-                        day_process.loc[index, "end"] = end
-                        day_process.loc[index, "jitter_secs"] = jitter
-
-                        if self.variable_duration:
-                            end = row.end
-                        else:
-                            end = start + timedelta(seconds=self.seconds_per_file)
-                        # round the end time to the nearest second as the timestamp is only accurate to the second
-                        end = end.replace(microsecond=0)
-                        # set the times for the next files
-                        start = end
+                    # correct the metadata: the first file keeps its start time and each
+                    # subsequent file starts where the previous one ends, with the time
+                    # rounded down to the second as the timestamp is only accurate to the second
+                    # (.values gives the UTC times as a datetime64 array)
+                    orig_start = day_process["start"].values
+                    step = self._file_duration
+                    start = np.empty_like(orig_start)
+                    start[0] = orig_start[0]
+                    if len(start) > 1:
+                        second_start = (orig_start[0] + step).astype("datetime64[s]")
+                        start[1:] = second_start + np.arange(
+                            len(start) - 1
+                        ) * step.astype("timedelta64[s]")
+
+                    # jitter is the difference between the expected start time and the actual start time
+                    # jitter is 0 for the first file
+                    jitter = (start - orig_start) / np.timedelta64(1, "s")
+
+                    # correct the start and end times
+                    day_process["start"] = pd.DatetimeIndex(start, tz="UTC")
+                    day_process["end"] = pd.DatetimeIndex(start + step, tz="UTC")
+                    day_process["jitter_secs"] = jitter.astype(int)
             else:
                 day_process = self.no_jitter(self.day, day_process)
 
-            # drop any rows with duplicate uri times, keeping the first
-            # duplicates can be caused by the jitter correction
-            if "uri" in day_process.columns:
-                day_process = day_process.drop_duplicates(subset=["uri"], keep="first")
-            if "url" in day_process.columns:
-                day_process = day_process.drop_duplicates(subset=["url"], keep="first")
+            # drop any rows with duplicate uri times, keeping the first, and sort by start;
+            # done with a single take. duplicates can be caused by the jitter correction
+            keep = np.flatnonzero(~day_process[uri_column].duplicated().to_numpy())
+            order = np.argsort(day_process["start"].values[keep], kind="stable")
+            day_process = day_process.take(keep[order])
 
-            # save explicitly as UTC by setting the timezone in the start and end times
-            day_process["start"] = day_process["start"].dt.tz_localize("UTC")
             # Note: as day_process["end"] coming from upstream seems to become incorrect
             # (except for the first entry in the JSON), that is, with `end` becoming equal to `start`,
             # directly assigning it here based on day_process["start"]:
-            day_process["end"] = day_process["start"] + timedelta(
-                seconds=self.seconds_per_file
-            )
+            day_process["end"] = day_process["start"] + self._file_duration
             # TODO(Danelle): review/confirm the above.
 
             self.save_day(self.day, day_process)
@@ -174,7 +174,9 @@ class MetadataCorrector:
             log.exception(f"Error correcting metadata for  {self.day}. {e}")
         finally:
             log.debug(
-                f"Done correcting metadata for {self.day}. Saved to {self.json_base_dir}"
+                "Done correcting metadata for {}. Saved to {}",
+                self.day,
+                self.json_base_dir,
             )
 
     def no_jitter(self, day: datetime, day_process: pd.DataFrame) -> pd.DataFrame:
@@ -191,15 +193,14 @@ class MetadataCorrector:
             f"Cannot correct {self.day}. Using file start times as is, setting jitter to 0 and using "
             f"calculated end times."
         )
-        # calculate the difference between each row start time and save as diff in a copy of the dataframe
-        day_process = day_process.copy()
-        day_process["diff"] = day_process["start"].diff()
-        day_process["jitter_secs"] = 0
-        # calculate the end time which is the start time plus the number of seconds in the file
-        day_process["end"] = day_process["start"] + pd.to_timedelta(
-            day_process["duration_secs"], unit="s"
+        # calculate the difference between each row start time and save as diff, and
+        # the end time which is the start time plus the number of seconds in the file
+        return day_process.assign(
+            diff=day_process["start"].diff(),
+            jitter_secs=0,
+            end=day_process["start"]
+            + pd.to_timedelta(day_process["duration_secs"], unit="s"),
         )
-        return day_process
 
     def save_day(self, day: datetime, day_process: pd.DataFrame, prefix: str = None):
         """
@@ -207,53 +208,45 @@ class MetadataCorrector:
         :param day:
             The day to save
         :param day_process:
-            The dataframe containing the metadata for the day
+            The dataframe containing the metadata for the day, sorted by start
         :param prefix:
             An optional prefix for the filename
         :return:
         """
+        # drop the pcm, fs, subtype, etc. columns
+        columns_to_drop = ["fs", "subtype", "jitter_secs"]
+
         # if the exception column is empty, then drop it
         if day_process["exception"].isnull().all():
-            day_process.drop(columns=["exception"], inplace=True)
+            columns_to_drop.append("exception")
         else:
             # replace the NaN with an empty string
-            day_process["exception"].fillna("", inplace=True)
-
-        # drop the pcm, fs, subtype, etc. columns
-        day_process.drop(columns=["fs", "subtype", "jitter_secs"], inplace=True)
+            day_process = day_process.assign(
+                exception=day_process["exception"].fillna("")
+            )
 
         # if there is a diff column, then drop it
         if "diff" in day_process.columns:
-            day_process.drop(columns=["diff"], inplace=True)
-
-        # Save with second accuracy to a temporary file formatted with ISO date format
-        df_final = day_process.sort_values(by=["start"])
+            columns_to_drop.append("diff")
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-            tmp_path = Path(tmpdir)
-            if prefix:
-                temp_metadata = tmp_path / f"{prefix}_{day:%Y%m%d}.json"
-            else:
-                temp_metadata = tmp_path / f"{day:%Y%m%d}.json"
-
-            df_final.to_json(
-                temp_metadata.as_posix(),
-                orient="records",
-                date_format="iso",
-                date_unit="s",
-            )
-            log.debug(f"Wrote {temp_metadata.as_posix()}")
+        day_process = day_process.drop(columns=columns_to_drop)
 
-            # read the file back in using records format with json
-            with open(temp_metadata.as_posix(), "r") as f:
-                dict_records = json.load(f)
+        # Save with second accuracy formatted with ISO date format
+        dict_records = json.loads(
+            day_process.to_json(orient="records", date_format="iso", date_unit="s")
+        )
 
-            # write the file back out with indenting
-            with open(temp_metadata.as_posix(), "w", encoding="utf-8") as f:
-                json.dump(dict_records, f, ensure_ascii=True, indent=4)
+        # write the file to a local metadata directory with year subdirectory
+        output_path = Path(self.json_base_dir, str(day.year))
+        output_path.mkdir(parents=True, exist_ok=True)
+        if prefix:
+            metadata_path = output_path / f"{prefix}_{day:%Y%m%d}.json"
+        else:
+            metadata_path = output_path / f"{day:%Y%m%d}.json"
 
-            # copy the file to a local metadata directory with year subdirectory
-            output_path = Path(self.json_base_dir, str(day.year))
-            output_path.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(temp_metadata.as_posix(), output_path)
-            log.info(f"Wrote {output_path}/{temp_metadata.name}")
+        # write the file out with indenting, in a single write
+        # (json.dump would issue a write call for each encoded chunk)
+        metadata_path.write_text(
+            json.dumps(dict_records, ensure_ascii=True, indent=4), encoding="utf-8"
+        )
+        log.info(f"Wrote {metadata_path.as_posix()}")
@@ -53,6 +53,16 @@ class MetadataGeneratorAbstract(object):
     def correct_df(self):
         return self.df
 
+    def _categorize_uris(self):
+        """
+        Converts the uri (or url) column of the metadata to a categorical dtype,
+        so the per-day slicing and deduplication done by the corrector operate on
+        integer codes instead of the full strings.
+        """
+        for column in ("uri", "url"):
+            if column in self.df.columns:
+                self.df[column] = self.df[column].astype("category")
+
     # abstract run method
     def run(self):
         pass
@@ -2,12 +2,18 @@
 # Filename: metadata/generator/gen_iclisten.py
 # Description:  Captures ICListen wav metadata in a pandas dataframe from either a local directory or S3 bucket.
 
+import bisect
+import json
 import re
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
 from datetime import timedelta
 from datetime import datetime
-from typing import List
+from typing import Any, List, Optional
 
 import boto3
+from loguru import logger as log
 
 import pandas as pd
 from pathlib import Path
@@ -29,6 +35,8 @@ class IcListenMetadataGenerator(MetadataGeneratorAbstract):
         end: datetime,
         prefix: List[str],
         seconds_per_file: float = 300.0,
+        listing_cache_dir: Optional[str] = None,
+        listing_cache_max_age_days: float = 30.0,
     ):
         """
         Captures ICListen wav metadata in a pandas dataframe from either a local directory or S3 bucket.
@@ -44,10 +52,28 @@ class IcListenMetadataGenerator(MetadataGeneratorAbstract):
             The search pattern to match the wav files, e.g. 'MARS' for MARS_YYYYMMDD_HHMMSS.wav
         :param seconds_per_file:
             The number of seconds per file expected in a wav file to check for missing data. If 0, then no check is done.
+        :param listing_cache_dir:
+            Optional local directory to cache the S3 listings of past dates in, so repeated runs
+            over the same dates do not list them again. By default, no caching is done.
+        :param listing_cache_max_age_days:
+            Cached listings older than this are listed again, to pick up any files uploaded late.
+            Use 0 to refresh all the cached listings.
         :return:
         """
         super().__init__(uri, json_base_dir, prefix, start, end, seconds_per_file)
+        self.listing_cache_dir = listing_cache_dir
+        self.listing_cache_max_age_days = listing_cache_max_age_days
         self.log_prefix = f"{self.__class__.__name__} {start:%Y%m%d}"
+        # for each prefix, the search pattern and the capture of the file timestamp
+        self._prefix_patterns = [
+            (
+                re.compile(s),
+                re.compile(
+                    rf"{re.escape(s)}_(\d{{4}})(\d{{2}})(\d{{2}})_(\d{{2}})(\d{{2}})(\d{{2}})"
+                ),
+            )
+            for s in prefix
+        ]
 
     def run(self):
         log.info(f"Generating metadata for {self.start} to {self.end}...")
@@ -59,127 +85,219 @@ class IcListenMetadataGenerator(MetadataGeneratorAbstract):
             log.error(f"{self.log_prefix} GS is not supported for icListen audio files")
             return
 
-        # Run for each day in the range
-        for day in pd.date_range(self.start, self.end, freq="D"):
-            try:
-                self.df = None
-                log.info(
-                    f"{self.log_prefix} Searching in {self.audio_loc}/*.wav for wav files that match the search pattern {self.prefix}* ..."
+        # the client is thread safe, so it is shared by all the days
+        client = boto3.client("s3") if scheme == "s3" else None
+
+        # a local directory is scanned once for all the days
+        wav_paths = (
+            [f.as_posix() for f in Path("/", bucket_name, prefix).rglob("*.wav")]
+            if scheme == "file"
+            else []
+        )
+
+        # the days are independent, and listing S3 is latency bound, so process them
+        # concurrently; local directories are scanned one day at a time.
+        # the listings of all the days go through a single shared pool, so at most 8
+        # list calls are in flight on the client at once; the day threads only wait
+        # on their listings, and a listing never submits more work, so this cannot deadlock
+        days = pd.date_range(self.start, self.end, freq="D")
+        with ThreadPoolExecutor(max_workers=8) as listing_executor, ThreadPoolExecutor(
+            max_workers=4 if scheme == "s3" else 1
+        ) as executor:
+            list(
+                executor.map(
+                    lambda day: self._process_day(
+                        day, bucket_name, scheme, client, wav_paths, listing_executor
+                    ),
+                    days,
                 )
+            )
 
-                wav_files = []
-
-                def check_file(f: str, f_start_dt: datetime, f_end_dt: datetime):
+    def _process_day(
+        self,
+        day: datetime,
+        bucket_name: str,
+        scheme: str,
+        client: Any,
+        wav_paths: List[str],
+        listing_executor: Executor,
+    ):
+        """
+        Generates the metadata for a single day
+        :param day:
+            The day to process
+        :param bucket_name:
+            The S3 bucket name, without the year suffix
+        :param scheme:
+            The scheme of the audio location
+        :param client:
+            The S3 client, if the audio location is in S3
+        :param wav_paths:
+            The wav files in the audio location, if it is a local directory
+        :param listing_executor:
+            The executor, shared by all the days, that lists the S3 keys
+        """
+        try:
+            log.info(
+                f"{self.log_prefix} Searching in {self.audio_loc}/*.wav for wav files that match the search pattern {self.prefix}* ..."
+            )
+
+            wav_files = []
+
+            def check_file(f: str, f_start_dt: datetime, f_end_dt: datetime):
+                """
+                Check if the file matches the search pattern and is within the start and end dates
+                :param f:
+                    The path to the file
+                :param f_start_dt:
+                    The start date to check
+                :param f_end_dt:
+                    The end date to check
+                :return:
+                """
+
+                f_path = Path(f)
+                f_wav_dt = None
+
+                for search_re, timestamp_re in self._prefix_patterns:
+                    # see if the file is a regexp match to search
+                    rc = search_re.search(f_path.stem)
+
+                    if rc and rc.group(0):
+                        try:
+                            # MARS file date is in the filename MARS_YYYYMMDD_HHMMSS.wav
+                            ts = timestamp_re.fullmatch(f_path.stem)
+                            if ts is None:
+                                raise ValueError(f_path.stem)
+                            year, month, f_day, hour, minute, second = map(
+                                int, ts.groups()
+                            )
+                            f_path_dt = datetime(year, month, f_day, hour, minute, second)
+
+                            if f_start_dt <= f_path_dt <= f_end_dt:
+                                log.info(
+                                    f"{self.log_prefix} Found {f_path.name} to process"
+                                )
+                                wav_files.append(IcListenWavFile(f, f_path_dt))
+                                f_wav_dt = f_path_dt
+                        except ValueError:
+                            log.error(f"{self.log_prefix} Could not parse {f_path.name}")
+                            return None
+
+                return f_wav_dt
+
+            # Set the start and end dates to 30 minutes before and after the start and end dates
+            start_dt = day - timedelta(hours=1)
+            end_dt = day + timedelta(days=1)
+
+            if scheme == "file":
+                for filename in progressbar(wav_paths, prefix="Searching : "):
+                    check_file(filename, start_dt, end_dt)
+            if scheme == "s3":
+
+                def list_keys(
+                    bucket: str, prefix: str, date: datetime
+                ) -> List[Optional[List[str]]]:
                     """
-                    Check if the file matches the search pattern and is within the start and end dates
-                    :param f:
-                        The path to the file
-                    :param f_start_dt:
-                        The start date to check
-                    :param f_end_dt:
-                        The end date to check
+                    List the object keys in the bucket with the given prefix
+                    :param bucket:
+                        The bucket to list
+                    :param prefix:
+                        The prefix to list
+                    :param date:
+                        The date covered by the prefix
                     :return:
+                        The keys in each page of the listing; None for a page with no data
                     """
-
-                    f_path = Path(f)
-                    f_wav_dt = None
-
-                    for s in self.prefix:
-                        # see if the file is a regexp match to search
-                        rc = re.search(s, f_path.stem)
-
-                        if rc and rc.group(0):
-                            try:
-                                # MARS file date is in the filename MARS_YYYYMMDD_HHMMSS.wav
-                                f_path_dt = datetime.strptime(
-                                    f_path.stem, f"{s}_%Y%m%d_%H%M%S"
-                                )
-
-                                if f_start_dt <= f_path_dt <= f_end_dt:
-                                    log.info(
-                                        f"{self.log_prefix} Found {f_path.name} to process"
-                                    )
-                                    wav_files.append(IcListenWavFile(f, f_path_dt))
-                                    f_wav_dt = f_path_dt
-                            except ValueError:
-                                log.error(
-                                    f"{self.log_prefix} Could not parse {f_path.name}"
-                                )
-                                return None
-
-                    return f_wav_dt
-
-                # Set the start and end dates to 30 minutes before and after the start and end dates
-                start_dt = day - timedelta(hours=1)
-                end_dt = day + timedelta(days=1)
-
-                # set the window to 3x the expected duration of the wav file to account for any missing data
-                minutes_window = int(self.seconds_per_file * 3 / 60)
-                start_dt_hour = start_dt - timedelta(minutes=minutes_window)
-                end_dt_hour = end_dt + timedelta(minutes=minutes_window)
-
-                if scheme == "file":
-                    wav_path = Path(self.audio_loc)
-                    for filename in progressbar(
-                        sorted(wav_path.rglob("*.wav")), prefix="Searching : "
-                    ):
-                        check_file(filename.as_posix(), start_dt, end_dt)
-                if scheme == "s3":
-                    client = boto3.client("s3")
-                    for day_hour in pd.date_range(start=start_dt, end=end_dt, freq="h"):
-                        bucket = f"{bucket_name}-{day_hour.year:04d}"
-                        prefix = f"{day_hour.month:02d}/MARS_{day_hour.year:04d}{day_hour.month:02d}{day_hour.day:02d}_{day_hour.hour:02d}"
-                        paginator = client.get_paginator("list_objects")
-
-                        operation_parameters = {"Bucket": bucket, "Prefix": prefix}
-                        page_iterator = paginator.paginate(**operation_parameters)
-                        log.info(
-                            f"{self.log_prefix}  Searching in bucket: {bucket} prefix: {prefix}"
+                    # listings of dates well in the past rarely change, so they can be cached
+                    cache_path = None
+                    if self.listing_cache_dir:
+                        cache_path = Path(
+                            self.listing_cache_dir, bucket, f"{prefix}.listing"
                         )
-                        # list the objects in the bucket
-                        # loop through the objects and check if they match the search pattern
-                        for page in page_iterator:
-                            if "Contents" not in page:
-                                log.info(f"{self.log_prefix}  No data found in {bucket}")
-                                break
-
-                            for obj in page["Contents"]:
-                                key = obj["Key"]
-                                wav_dt = check_file(
-                                    f"s3://{bucket}/{key}", start_dt, end_dt
-                                )
-                                if wav_dt is None:
-                                    continue
-                                if wav_dt > end_dt_hour:
-                                    break
-                                if wav_dt < start_dt_hour:
-                                    break
-
-                log.info(
-                    f"{self.log_prefix}  Found {len(wav_files)} files to process that cover the period {start_dt} - {end_dt}"
+                        max_age_secs = self.listing_cache_max_age_days * 86400
+                        if (
+                            cache_path.exists()
+                            and time.time() - cache_path.stat().st_mtime < max_age_secs
+                        ):
+                            return json.loads(cache_path.read_text())
+
+                    paginator = client.get_paginator("list_objects")
+                    operation_parameters = {"Bucket": bucket, "Prefix": prefix}
+                    pages: List[Optional[List[str]]] = []
+                    for page in paginator.paginate(**operation_parameters):
+                        if "Contents" not in page:
+                            pages.append(None)
+                            break
+                        pages.append([obj["Key"] for obj in page["Contents"]])
+
+                    if cache_path and date + timedelta(days=2) < datetime.utcnow():
+                        # written aside and then moved into place, as the days
+                        # processed concurrently may read the same listing
+                        cache_path.parent.mkdir(parents=True, exist_ok=True)
+                        tmp_path = cache_path.with_suffix(f".{threading.get_ident()}.tmp")
+                        tmp_path.write_text(json.dumps(pages))
+                        tmp_path.replace(cache_path)
+                    return pages
+
+                # the keys are listed for each date covering the hours, which takes
+                # a single page per date rather than a listing per hour
+                dates = pd.date_range(start=start_dt.date(), end=end_dt.date(), freq="D")
+                bucket_prefixes = list(
+                    zip(
+                        dates.strftime(f"{bucket_name}-%Y"),
+                        dates.strftime("%m/MARS_%Y%m%d_"),
+                        dates,
+                    )
                 )
 
-                # sort the files by start time
-                wav_files.sort(key=lambda x: x.start)
-
-                # create a dataframe from the wav files
-                log.info(
-                    f"{self.log_prefix}  Creating dataframe from {len(wav_files)} files spanning {wav_files[0].start} to {wav_files[-1].start}..."
+                # the listings are I/O bound, so they are requested concurrently and
+                # the order of the S3 calls is undefined; the results are still
+                # consumed in date order, so the files are checked in order
+                listings = listing_executor.map(
+                    lambda bp: list_keys(*bp), bucket_prefixes
                 )
-                for wc in wav_files:
-                    df_wav = wc.to_df()
-
-                    # concatenate the metadata to the dataframe
-                    self.df = pd.concat([self.df, df_wav], axis=0)
-
-                log.debug(f"{self.log_prefix}  Running metadata corrector for {day}")
-                corrector = MetadataCorrector(
-                    self.df, self.json_base_dir, day, False, 600.0
-                )
-                corrector.run()
-
-            except Exception as ex:
-                log.exception(str(ex))
+                for (bucket, prefix, date), pages in zip(bucket_prefixes, listings):
+                    log.info(
+                        f"{self.log_prefix}  Searching in bucket: {bucket} prefix: {prefix}"
+                    )
+                    keys = []
+                    for page_keys in pages:
+                        if page_keys is None:
+                            log.info(f"{self.log_prefix}  No data found in {bucket}")
+                            break
+                        keys.extend(page_keys)
+
+                    # the keys are listed in order, so the ones in the hours to search,
+                    # e.g. 07/MARS_20230718_00 to 07/MARS_20230718_23, are located by bisection
+                    first_hour = start_dt.hour if date == dates[0] else 0
+                    last_hour = end_dt.hour if date == dates[-1] else 23
+                    lo = bisect.bisect_left(keys, f"{prefix}{first_hour:02d}")
+                    hi = bisect.bisect_left(keys, f"{prefix}{last_hour + 1:02d}")
+
+                    # loop through the objects and check if they match the search pattern
+                    for key in keys[lo:hi]:
+                        check_file(f"s3://{bucket}/{key}", start_dt, end_dt)
+
+            log.info(
+                f"{self.log_prefix}  Found {len(wav_files)} files to process that cover the period {start_dt} - {end_dt}"
+            )
+
+            # create a dataframe from the wav files, sorted by start time
+            df = pd.DataFrame(
+                [wc.to_record() for wc in wav_files],
+                index=[wc.start for wc in wav_files],
+            ).sort_values(by=["start"], kind="stable")
+            log.info(
+                f"{self.log_prefix}  Created dataframe from {len(wav_files)} files spanning {df['start'].iat[0]} to {df['start'].iat[-1]}..."
+            )
+
+            log.debug("{}  Running metadata corrector for {}", self.log_prefix, day)
+            corrector = MetadataCorrector(df, self.json_base_dir, day, False, 600.0)
+            corrector.run()
+
+        except Exception as ex:
+            log.exception(str(ex))
 
 
 if __name__ == "__main__":
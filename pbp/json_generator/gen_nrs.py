@@ -3,8 +3,8 @@
 # Description:  Captures NRS flac metadata in a pandas dataframe from either a local directory or gs bucket.
 
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, datetime
-import time
 from typing import List
 
 from loguru import logger as log
@@ -12,12 +12,14 @@ from google.cloud import storage
 
 import pandas as pd
 from pathlib import Path
-from progressbar import progressbar
 from pbp.json_generator.corrector import MetadataCorrector
 from pbp.json_generator.metadata_extractor import FlacFile
 from pbp.json_generator.gen_abstract import MetadataGeneratorAbstract
 from pbp.json_generator.utils import parse_s3_or_gcp_url
 
+# the timestamp following the prefix in the file name, e.g. NRS11_20191231_230836
+_TIMESTAMP_RE = re.compile(r"^[^_]*_(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})(?:_|$)")
+
 
 class NRSMetadataGenerator(MetadataGeneratorAbstract):
     def __init__(
@@ -46,6 +48,40 @@ class NRSMetadataGenerator(MetadataGeneratorAbstract):
         :return:
         """
         super().__init__(uri, json_base_dir, prefix, start, end, seconds_per_file)
+        self._prefix_patterns = [re.compile(s) for s in prefix]
+
+    def _parse_filenames(self, paths: List[str]) -> pd.Series:
+        """
+        Parse the beginning recording times from the file names
+        :param paths:
+            The paths or urls of the files
+        :return:
+            The beginning recording times indexed by path; NaT for the files that do not
+            match the search pattern or could not be parsed
+        """
+        names = pd.Series(paths, index=paths, dtype=object).str.rsplit("/", n=1).str[-1]
+        stems = names.str.replace(r"\.[^.]*$", "", regex=True)
+
+        # see if the files are a regexp match to search
+        matched = pd.Series(False, index=stems.index)
+        for search_re in self._prefix_patterns:
+            matched |= stems.str.contains(search_re)
+
+        # files are in the format NRS11_20191231_230836.flac'
+        # extract the timestamp from the file names into the format YYYYMMDDHHMMSS
+        ts = stems.str.extract(_TIMESTAMP_RE)
+        # If the last two digits of the timestamp are 60, make them 59
+        ts[5] = ts[5].mask(ts[5] == "60", "59")
+        f_path_dts = pd.to_datetime(
+            ts[0] + ts[1] + ts[2] + ts[3] + ts[4] + ts[5],
+            format="%Y%m%d%H%M%S",
+            errors="coerce",
+        )
+
+        for name in names[matched & f_path_dts.isna()]:
+            log.error(f"Could not parse {name}")
+
+        return f_path_dts.where(matched)
 
     def run(self):
         log.info(f"Generating metadata for {self.start} to {self.end}...")
@@ -57,41 +93,6 @@ class NRSMetadataGenerator(MetadataGeneratorAbstract):
             log.error("S3 is not supported for NRS audio files")
             return
 
-        def parse_filename(f: str) -> datetime:
-            """
-            Check if the file matches the search pattern and is within the start and end dates
-            :param f:
-                The path to the file
-            :return: The beginning recording time of the file
-            """
-            f_path = Path(f)
-            f_flac_dt = None
-
-            for s in self.prefix:
-                # see if the file is a regexp match to search
-                rc = re.search(s, f_path.stem)
-
-                if rc and rc.group(0):
-                    try:
-                        # files are in the format NRS11_20191231_230836.flac'
-                        # extract the timestamp from the file name into the format YYYYMMDDHHMMSS
-                        f_parts = f_path.stem.split("_")
-                        # If the last two digits of the timestamp are 60, subtract 1 second
-                        if f_parts[2][-2:] == "60":
-                            f_parts = f_parts[1] + f_parts[2]
-                            # Make the last two digits 59
-                            f_parts = f_parts[:-2] + "59"
-                        else:
-                            f_parts = f_parts[1] + f_parts[2]
-
-                        f_path_dt = datetime.strptime(f_parts, "%Y%m%d%H%M%S")
-                        return f_path_dt
-                    except ValueError:
-                        log.error(f"Could not parse {f_path.name}")
-                        return None
-
-            return f_flac_dt
-
         flac_files = []
         self.df = None
         log.info(
@@ -111,34 +112,44 @@ class NRSMetadataGenerator(MetadataGeneratorAbstract):
 
         if scheme == "file" or scheme == "":
             flac_path = Path(f"/{bucket}/{prefix}")
-            for filename in progressbar(
-                sorted(flac_path.rglob("*.flac")), prefix="Searching : "
-            ):
-                flac_dt = parse_filename(filename)
-                if start_dt <= flac_dt <= end_dt:
-                    log.info(f"Found file {filename} with timestamp {flac_dt}")
-                    flac_files.append(FlacFile(filename, flac_dt))
+            flac_paths = [f.as_posix() for f in flac_path.rglob("*.flac")]
+            flac_dts = self._parse_filenames(flac_paths)
+            # no need to sort the files here, the metadata is sorted by start time below
+            for filename, flac_dt in flac_dts[flac_dts.between(start_dt, end_dt)].items():
+                log.info(f"Found file {filename} with timestamp {flac_dt}")
+                flac_files.append(FlacFile(filename, flac_dt.to_pydatetime()))
         if scheme == "gs":
             client = storage.Client.create_anonymous_client()
             bucket_obj = client.get_bucket(bucket)
 
             # get list of files - this is a generator
             # data is organized in a flat filesystem, so there are no optimizations here for querying
+            # (the client retries on rate limiting and transient errors, so no throttling here)
             blobs = bucket_obj.list_blobs(prefix=prefix)
-            for i, blob in enumerate(blobs):
-                log.info(f"Processing {blob.name}")
-                f_path = f"gs://{bucket}/{blob.name}"
-                flac_dt = parse_filename(f_path)
-                if start_dt <= flac_dt <= end_dt:
-                    log.info(f"Found file {blob.name} with timestamp {flac_dt}")
-                    flac_files.append(FlacFile(f_path, flac_dt))
-                # delay to avoid 400 error
-                if i % 100 == 0:
-                    log.info(f"{i} files processed")
-                    time.sleep(1)
-                if flac_dt > end_dt:
+            found = []
+            num_blobs = 0
+            # the names in each page of the listing are parsed at once
+            for page in blobs.pages:
+                flac_dts = self._parse_filenames(
+                    [f"gs://{bucket}/{blob.name}" for blob in page]
+                )
+                num_blobs += len(flac_dts)
+                log.info(f"{num_blobs} files processed")
+                for f_path, flac_dt in flac_dts[
+                    flac_dts.between(start_dt, end_dt)
+                ].items():
+                    log.info(f"Found file {f_path} with timestamp {flac_dt}")
+                    found.append((f_path, flac_dt.to_pydatetime()))
+                # the files are listed in time order, so stop once past the end date
+                if (flac_dts > end_dt).any():
                     break
 
+            # reading the flac headers is latency bound, so fetch them concurrently,
+            # but only a few at a time as the anonymous requests may get rate limited
+            # (the reads are retried with backoff when that happens)
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                flac_files = list(executor.map(lambda f: FlacFile(*f), found))
+
         log.info(
             f"Found {len(flac_files)} files to process that cover the period {start_dt} - {end_dt}"
         )
@@ -146,13 +157,14 @@ class NRSMetadataGenerator(MetadataGeneratorAbstract):
         if len(flac_files) == 0:
             return
 
-        # sort the files by start time
-        flac_files.sort(key=lambda x: x.start)
-        for wc in flac_files:
-            df_flac = wc.to_df()
+        # create a dataframe from the flac files, sorted by start time
+        self.df = pd.DataFrame(
+            [wc.to_record() for wc in flac_files],
+            index=[wc.start for wc in flac_files],
+        ).sort_values(by=["start"], kind="stable")
 
-            # concatenate the metadata to the dataframe
-            self.df = pd.concat([self.df, df_flac], axis=0)
+        # the same metadata is used to correct each day
+        self._categorize_uris()
 
         # correct each day in the range
         for day in pd.date_range(self.start, self.end, freq="D"):
@@ -160,10 +172,10 @@ class NRSMetadataGenerator(MetadataGeneratorAbstract):
                 # create a dataframe from the flac files
                 log.info(
                     f"Creating dataframe from {len(flac_files)} "
-                    f"files spanning {flac_files[0].start} to {flac_files[-1].start} in self.json_base_dir..."
+                    f"files spanning {self.df['start'].iat[0]} to {self.df['start'].iat[-1]} in self.json_base_dir..."
                 )
 
-                log.debug(f" Running metadata corrector for {day}")
+                log.debug(" Running metadata corrector for {}", day)
                 corrector = MetadataCorrector(
                     self.df,
                     self.json_base_dir,
@@ -1,7 +1,7 @@
 # pypam-based-processing
 # Filename: json_generator/gen_soundtrap.py
 # Description:  Captures SoundTrap metadata either from a local directory of S3 bucket
-from typing import List
+from typing import List, Optional
 
 import boto3
 import datetime
@@ -10,6 +10,7 @@ import re
 import pytz
 
 from datetime import timedelta
+from loguru import logger as log
 from pathlib import Path
 from progressbar import progressbar
 
@@ -18,6 +19,9 @@ from pbp.json_generator.metadata_extractor import SoundTrapWavFile
 from pbp.json_generator.corrector import MetadataCorrector
 from pbp.json_generator.utils import parse_s3_or_gcp_url
 
+# the timestamp following the serial number in the file name, e.g. 7000.230718010000.log.xml
+_TIMESTAMP_RE = re.compile(r"[^.]*\.(\d{12})(?:\.|$)")
+
 
 class SoundTrapMetadataGenerator(MetadataGeneratorAbstract):
     """
@@ -52,6 +56,7 @@ class SoundTrapMetadataGenerator(MetadataGeneratorAbstract):
         :return:
         """
         super().__init__(uri, json_base_dir, prefix, start, end, 0.0)
+        self._prefix_patterns = [re.compile(s) for s in prefix]
 
     def run(self):
         try:
@@ -69,7 +74,7 @@ class SoundTrapMetadataGenerator(MetadataGeneratorAbstract):
                 log.error("GS not supported for SoundTrap")
                 return
 
-            def get_file_date(xml_file: str) -> datetime | None:
+            def get_file_date(xml_file: str) -> Optional[datetime.datetime]:
                 """
                 Check if the xml file is in the search pattern and is within the start and end dates
                 :param xml_file:
@@ -79,14 +84,17 @@ class SoundTrapMetadataGenerator(MetadataGeneratorAbstract):
                 """
                 xml_file = Path(xml_file)
                 # see if the file is a regexp match to self.prefix
-                for s in self.prefix:
-                    rc = re.search(s, xml_file.stem)
+                for search_re in self._prefix_patterns:
+                    rc = search_re.search(xml_file.stem)
 
                     if rc and rc.group(0):
                         try:
-                            # If a SoundTrap file, then the date is in the filename XXXX.YYYYMMDDHHMMSS.xml
-                            f_path_dt = datetime.strptime(
-                                xml_file.stem.split(".")[1], "%y%m%d%H%M%S"
+                            # If a SoundTrap file, then the date is in the filename XXXX.YYMMDDHHMMSS.xml
+                            ts = _TIMESTAMP_RE.match(xml_file.stem)
+                            if ts is None:
+                                raise ValueError(xml_file.stem)
+                            f_path_dt = datetime.datetime.strptime(
+                                ts.group(1), "%y%m%d%H%M%S"
                             )
                             if self.start <= f_path_dt <= self.end:
                                 return f_path_dt
@@ -147,21 +155,22 @@ class SoundTrapMetadataGenerator(MetadataGeneratorAbstract):
             if len(wav_files) == 0:
                 return
 
-            # sort the files by start time
-            wav_files.sort(key=lambda x: x.start)
-
-            # create a dataframe from the wav files
+            # create a dataframe from the wav files, sorted by start time
+            self.df = pd.DataFrame(
+                [wc.to_record() for wc in wav_files],
+                index=[wc.start for wc in wav_files],
+            ).sort_values(by=["start"], kind="stable")
             log.info(
-                f"Creating dataframe from {len(wav_files)} files spanning {wav_files[0].start} to {wav_files[-1].start}..."
+                f"Created dataframe from {len(wav_files)} files spanning {self.df['start'].iat[0]} to {self.df['start'].iat[-1]}..."
             )
-            for wc in wav_files:
-                df_wav = wc.to_df()
 
-                # concatenate the metadata to the dataframe
-                self.df = pd.concat([self.df, df_wav], axis=0)
+            # the same metadata is used to correct each day
+            self._categorize_uris()
 
             # drop any rows with duplicate uris, keeping the first
-            self.df = self.df.drop_duplicates(subset=["uri"], keep="first")
+            # (local files are given by url, otherwise by uri)
+            uri_column = "uri" if "uri" in self.df.columns else "url"
+            self.df = self.df.drop_duplicates(subset=[uri_column], keep="first")
 
         except Exception as ex:
             log.exception(str(ex))
@@ -175,7 +184,7 @@ class SoundTrapMetadataGenerator(MetadataGeneratorAbstract):
             # Correct the metadata for each day
             for day in range(days):
                 day_start = self.start + timedelta(days=day)
-                log.debug(f"Running metadata corrector for {day_start}")
+                log.debug("Running metadata corrector for {}", day_start)
                 variable_duration = True
                 corrector = MetadataCorrector(
                     self.df, self.json_base_dir, day_start, variable_duration, 0
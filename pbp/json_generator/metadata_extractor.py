@@ -7,8 +7,10 @@ from pathlib import Path
 from typing import Optional
 
 import numpy as np
+from urllib.error import HTTPError, URLError
 from six.moves.urllib.request import urlopen
 import io
+import time
 import re
 import soundfile as sf
 import pandas as pd
@@ -17,6 +19,47 @@ import xml.etree.ElementTree as ET
 from pbp.json_generator.utils import parse_s3_or_gcp_url
 
 
+# HTTP status codes worth retrying: the bucket may answer 400 or 429 when rate limiting
+_RETRY_HTTP_CODES = (400, 429, 500, 502, 503, 504)
+
+
+def read_url_bytes(
+    url: str, num_bytes: int, retries: int = 5, backoff_secs: float = 1.0
+) -> bytes:
+    """
+    Read the first bytes of a url, retrying with exponential backoff on rate limiting
+    and transient errors
+    :param url:
+        The url to read
+    :param num_bytes:
+        The number of bytes to read
+    :param retries:
+        The number of attempts before giving up; at least 1
+    :param backoff_secs:
+        The delay before the first retry; doubled for each subsequent retry
+    :return:
+        The bytes read
+    """
+    if retries < 1:
+        raise ValueError(f"retries must be at least 1, got {retries}")
+
+    attempt = 0
+    while True:
+        try:
+            with urlopen(url) as response:
+                return response.read(num_bytes)
+        except HTTPError as e:
+            if e.code not in _RETRY_HTTP_CODES or attempt == retries - 1:
+                raise
+            warning(f"HTTP {e.code} reading {url}. Retrying ...")
+        except URLError as e:
+            if attempt == retries - 1:
+                raise
+            warning(f"{e.reason} reading {url}. Retrying ...")
+        time.sleep(backoff_secs * 2**attempt)
+        attempt += 1
+
+
 class AudioFile:
     def __init__(self, path_or_url: str, start: datetime):
         """
@@ -39,37 +82,30 @@ class AudioFile:
     def has_exception(self):
         return True if len(self.exception) > 0 else False
 
-    def to_df(self):
-        # if the self.path_or_url is a url, then add to the data frame with the appropriate prefix
+    def to_record(self) -> dict:
+        """
+        The metadata of the file as a single record
+        :return:
+            A dictionary with the metadata; the file is given by uri if in the cloud, otherwise by url
+        """
+        # if the self.path_or_url is a url, then add to the record with the appropriate prefix
         if "s3://" in self.path_or_url or "gs://" in self.path_or_url:
-            df = pd.DataFrame(
-                {
-                    "uri": self.path_or_url,
-                    "start": self.start,
-                    "end": self.end,
-                    "fs": self.fs,
-                    "duration_secs": self.duration_secs,
-                    "channels": self.channels,
-                    "subtype": self.subtype,
-                    "exception": self.exception,
-                },
-                index=[self.start],
-            )
+            location = {"uri": self.path_or_url}
         else:
-            df = pd.DataFrame(
-                {
-                    "url": "file://" + self.path_or_url,
-                    "start": self.start,
-                    "end": self.end,
-                    "fs": self.fs,
-                    "duration_secs": self.duration_secs,
-                    "channels": self.channels,
-                    "subtype": self.subtype,
-                    "exception": self.exception,
-                },
-                index=[self.start],
-            )
-        return df
+            location = {"url": "file://" + self.path_or_url}
+        return {
+            **location,
+            "start": self.start,
+            "end": self.end,
+            "fs": self.fs,
+            "duration_secs": self.duration_secs,
+            "channels": self.channels,
+            "subtype": self.subtype,
+            "exception": self.exception,
+        }
+
+    def to_df(self):
+        return pd.DataFrame(self.to_record(), index=[self.start])
 
     def get_max_freq(self):
         return self.fs / 2
@@ -208,7 +244,7 @@ class FlacFile(AudioFile):
             if scheme == "gs":
                 url = f"http://storage.googleapis.com/{bucket}/{prefix}"
 
-                info = sf.info(io.BytesIO(urlopen(url).read(20_000)), verbose=True)
+                info = sf.info(io.BytesIO(read_url_bytes(url, 20_000)), verbose=True)
 
                 # get the duration from the extra_info data field which stores the duration in total bytes
                 fields = info.extra_info.split(":")
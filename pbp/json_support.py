@@ -92,7 +92,9 @@ def get_intersecting_entries(
     time_spec = (
         f"year={year} month={month} day={day} at_hour={at_hour} at_minute={at_minute}"
     )
-    log.debug(f"get_intersecting_entries: {time_spec} {len(json_entries)=}")
+    log.debug(
+        "get_intersecting_entries: {} len(json_entries)={}", time_spec, len(json_entries)
+    )
 
     # the requested start minute as datetime:
     dt = datetime(year, month, day, at_hour, at_minute, tzinfo=timezone.utc)
@@ -1,9 +1,6 @@
 from datetime import datetime
 from pathlib import Path
 
-from pbp.json_generator.gen_nrs import NRSMetadataGenerator
-from pbp.json_generator.gen_iclisten import IcListenMetadataGenerator
-from pbp.json_generator.gen_soundtrap import SoundTrapMetadataGenerator
 from pbp.main_json_generator_args import parse_arguments
 
 # Some imports, in particular involving data processing, cause a delay that is
@@ -34,6 +31,9 @@ def main():
 
     try:
         if opts.recorder == "NRS":
+            # pylint: disable=import-outside-toplevel
+            from pbp.json_generator.gen_nrs import NRSMetadataGenerator
+
             generator = NRSMetadataGenerator(
                 uri=opts.uri,
                 json_base_dir=json_dir.as_posix(),
@@ -43,16 +43,23 @@ def main():
             )
             generator.run()
         if opts.recorder == "ICLISTEN":
+            # pylint: disable=import-outside-toplevel
+            from pbp.json_generator.gen_iclisten import IcListenMetadataGenerator
+
             generator = IcListenMetadataGenerator(
                 uri=opts.uri,
                 json_base_dir=json_dir.as_posix(),
                 prefix=opts.prefix,
                 start=start,
                 end=end,
+                listing_cache_dir=opts.listing_cache_dir,
             )
             generator.run()
             # TODO: add multiprocessing here for speed-up
         if opts.recorder == "SOUNDTRAP":
+            # pylint: disable=import-outside-toplevel
+            from pbp.json_generator.gen_soundtrap import SoundTrapMetadataGenerator
+
             generator = SoundTrapMetadataGenerator(
                 uri=opts.uri,
                 json_base_dir=json_dir.as_posix(),
@@ -92,4 +92,13 @@ Examples:
         "underscore, e.g. 'MARS_'.",
     )
 
+    parser.add_argument(
+        "--listing-cache-dir",
+        type=str,
+        metavar="dir",
+        default=None,
+        help="Optional directory to cache the S3 listings of past dates for IcListen. "
+        "By default, no caching is done.",
+    )
+
     return parser.parse_args()
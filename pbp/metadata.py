@@ -1,10 +1,20 @@
+import copy
+import functools
 import json
+import os
+import pathlib
 from collections import OrderedDict
 from typing import Any, Dict, Optional
 
 import xarray as xr
 import yaml
 
+try:
+    # libyaml-based loader, considerably faster than the pure-Python one.
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader  # type: ignore[assignment]
+
 
 def parse_attributes(contents: str, suffix: str) -> OrderedDict[str, Any]:
     """
@@ -19,10 +29,37 @@ def parse_attributes(contents: str, suffix: str) -> OrderedDict[str, Any]:
     if suffix == ".json":
         return json.loads(contents, object_pairs_hook=OrderedDict)
     if suffix in (".yaml", ".yml"):
-        return yaml.load(contents, Loader=yaml.SafeLoader)
+        return yaml.load(contents, Loader=SafeLoader)
     raise ValueError(f"Unrecognized contents for format: {suffix}")
 
 
+def parse_attributes_file(filename: str) -> OrderedDict[str, Any]:
+    """
+    Parses the given JSON or YAML file into a dictionary of attributes.
+    The format is determined by the file extension.
+
+    Parsed contents are cached by (filename, modification time, size) so that
+    loading the same unchanged file again (e.g., when a ProcessHelper is created
+    for each day to be processed) does not re-parse it.
+    :param filename:
+        Path of the file to parse.
+    :return:
+        A new copy of the parsed attributes, so the caller is free to modify it.
+    """
+    st = os.stat(filename)
+    attrs = _parse_attributes_file(filename, st.st_mtime_ns, st.st_size)
+    return copy.deepcopy(attrs)
+
+
+@functools.lru_cache(maxsize=32)
+def _parse_attributes_file(
+    filename: str, mtime_ns: int, size: int
+) -> OrderedDict[str, Any]:
+    # mtime_ns and size are only used as part of the cache key.
+    with open(filename, "r", encoding="UTF-8") as f:
+        return parse_attributes(f.read(), pathlib.Path(filename).suffix)
+
+
 class MetadataHelper:
     def __init__(
         self,
@@ -9,7 +9,7 @@ import xarray as xr
 
 from pbp import get_pbp_version, get_pypam_version
 from pbp.file_helper import FileHelper
-from pbp.metadata import MetadataHelper, parse_attributes, replace_snippets
+from pbp.metadata import MetadataHelper, parse_attributes_file, replace_snippets
 from pbp.misc_helper import gen_hour_minute_times, parse_date
 from pbp.pypam_support import ProcessResult, PypamSupport
 
@@ -146,11 +146,10 @@ class ProcessHelper:
             self.log.info(f"Loading {what} attributes from {attrs_uri=}")
             filename = self.file_helper.get_local_filename(attrs_uri)
             if filename is not None:
-                with open(filename, "r", encoding="UTF-8") as f:
-                    res = parse_attributes(f.read(), pathlib.Path(filename).suffix)
-                    for k, v in set_attrs or []:
-                        res[k] = v
-                    return res
+                res = parse_attributes_file(filename)
+                for k, v in set_attrs or []:
+                    res[k] = v
+                return res
             else:
                 self.log.error(f"Unable to resolve '{attrs_uri=}'. Ignoring it.")
         else:
@@ -250,8 +249,10 @@ class ProcessHelper:
         dt = datetime(year, month, day, at_hour, at_minute, tzinfo=timezone.utc)
 
         self.log.debug(
-            f"Segment at {at_hour:02}h:{at_minute:02}m ...\n"
-            + f"  - extracting {file_helper.segment_size_in_mins * 60}-sec segment:"
+            "Segment at {:02}h:{:02}m ...\n  - extracting {}-sec segment:",
+            at_hour,
+            at_minute,
+            file_helper.segment_size_in_mins * 60,
         )
         extraction = file_helper.extract_audio_segment(at_hour, at_minute)
         if extraction is None:
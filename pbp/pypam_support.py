@@ -115,7 +115,7 @@ class PypamSupport:
             The datetime of the start of the missing segment.
         """
         self._captured_segments.append(_CapturedSegment(dt, 0, None))
-        self.log.debug(f"  captured segment: {dt}  (NO DATA)")
+        self.log.debug("  captured segment: {}  (NO DATA)", dt)
 
     def add_segment(self, dt: datetime, data: np.ndarray):
         """
@@ -136,7 +136,7 @@ class PypamSupport:
         num_secs = len(data) / self.fs
         self._captured_segments.append(_CapturedSegment(dt, num_secs, spectrum))
         self._num_actual_segments += 1
-        self.log.debug(f"  captured segment: {dt}")
+        self.log.debug("  captured segment: {}", dt)
 
     def process_captured_segments(
         self,
@@ -169,7 +169,7 @@ class PypamSupport:
             effort.append(np.float32(cs.num_secs))
 
             spectrum = nan_spectrum if cs.spectrum is None else cs.spectrum
-            self.log.debug(f"  spectrum for: {cs.dt} (effort={cs.num_secs})")
+            self.log.debug("  spectrum for: {} (effort={})", cs.dt, cs.num_secs)
             spectra.append(spectrum)
 
         self.log.info("Aggregating results ...")
@@ -0,0 +1,116 @@
+import json
+from datetime import datetime, timedelta
+from typing import List
+
+import pandas as pd
+
+from pbp.json_generator.corrector import MetadataCorrector
+
+
+def _create_df(starts: List[datetime], durations_secs: List[float]):
+    records = [
+        {
+            "uri": f"s3://bucket/file{i:03}.wav",
+            "start": file_start,
+            "end": file_start + timedelta(seconds=duration_secs),
+            "fs": 32000,
+            "duration_secs": duration_secs,
+            "channels": 1,
+            "subtype": "PCM_24",
+            "exception": None,
+        }
+        for i, (file_start, duration_secs) in enumerate(zip(starts, durations_secs))
+    ]
+    return pd.DataFrame(records, index=starts)
+
+
+def _load_day(json_dir, day: datetime):
+    with open(json_dir / f"{day:%Y}" / f"{day:%Y%m%d}.json") as f:
+        return json.load(f)
+
+
+def test_corrector_drift(tmp_path):
+    day = datetime(2023, 5, 2)
+    # 145 ten-minute files, each one starting a bit earlier than expected:
+    first = day - timedelta(seconds=300.5)
+    starts = [first + timedelta(seconds=i * 599.9) for i in range(145)]
+    df = _create_df(starts, [600.0] * 145)
+
+    MetadataCorrector(df, str(tmp_path), day, False, 600.0).run()
+
+    records = _load_day(tmp_path, day)
+    assert len(records) == 145
+    assert records[0]["uri"] == "s3://bucket/file000.wav"
+    assert records[0]["start"] == "2023-05-01T23:54:59Z"
+    assert records[0]["end"] == "2023-05-02T00:04:59Z"
+    assert records[1]["start"] == "2023-05-02T00:04:59Z"
+    assert records[-1]["start"] == "2023-05-02T23:54:59Z"
+    assert records[-1]["end"] == "2023-05-03T00:04:59Z"
+    assert "jitter_secs" not in records[0]
+
+
+def test_corrector_fixed_overlap(tmp_path):
+    day = datetime(2023, 5, 2)
+    # a file ending before the day, then 145 ten-minute files with the first
+    # one starting before the day and extending into it:
+    starts = [day - timedelta(seconds=900)] + [
+        day + timedelta(seconds=600 * i - 300) for i in range(145)
+    ]
+    df = _create_df(starts, [600.0] * len(starts))
+
+    MetadataCorrector(df, str(tmp_path), day, False, 600.0).run()
+
+    records = _load_day(tmp_path, day)
+    assert len(records) == 145
+    assert records[0]["uri"] == "s3://bucket/file001.wav"
+    assert records[0]["start"] == "2023-05-01T23:55:00Z"
+    assert records[0]["end"] == "2023-05-02T00:05:00Z"
+    assert records[-1]["uri"] == "s3://bucket/file145.wav"
+    assert records[-1]["start"] == "2023-05-02T23:55:00Z"
+
+
+def test_corrector_incomplete_file_no_jitter(tmp_path):
+    day = datetime(2023, 5, 2)
+    # ten ten-minute files, with the fifth one incomplete:
+    starts = [day + timedelta(seconds=600 * i + 3) for i in range(10)]
+    durations_secs = [600.0] * 10
+    durations_secs[4] = 300.0
+    df = _create_df(starts, durations_secs)
+
+    MetadataCorrector(df, str(tmp_path), day, False, 600.0).run()
+
+    # start times are used as is
+    records = _load_day(tmp_path, day)
+    assert len(records) == 10
+    assert [r["start"] for r in records] == [f"{s:%Y-%m-%dT%H:%M:%S}Z" for s in starts]
+    assert records[4]["uri"] == "s3://bucket/file004.wav"
+    assert records[4]["duration_secs"] == 300.0
+    assert "diff" not in records[0]
+    assert "jitter_secs" not in records[0]
+
+
+def test_corrector_variable_duration(tmp_path):
+    day = datetime(2023, 5, 2)
+    starts = [
+        day - timedelta(hours=7),  # before the 6 hour look back
+        day - timedelta(hours=5),
+        day + timedelta(hours=1),
+        day + timedelta(hours=23, minutes=50),
+        day + timedelta(days=1, minutes=10),  # next day
+    ]
+    df = _create_df(starts, [1200.0, 1000.0, 1200.0, 1100.0, 1200.0])
+
+    MetadataCorrector(df, str(tmp_path), day, True, 0).run()
+
+    records = _load_day(tmp_path, day)
+    assert [r["uri"] for r in records] == [
+        "s3://bucket/file001.wav",
+        "s3://bucket/file002.wav",
+        "s3://bucket/file003.wav",
+    ]
+    assert [r["start"] for r in records] == [
+        "2023-05-01T19:00:00Z",
+        "2023-05-02T01:00:00Z",
+        "2023-05-02T23:50:00Z",
+    ]
+    assert [r["duration_secs"] for r in records] == [1000.0, 1200.0, 1100.0]
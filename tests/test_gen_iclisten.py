@@ -0,0 +1,155 @@
+# Offline tests for IcListenMetadataGenerator, with a mocked S3 client.
+
+from datetime import datetime, timedelta
+from typing import List
+
+import pandas as pd
+import pytest
+
+import pbp.json_generator.gen_iclisten as gen_iclisten
+from pbp.json_generator.gen_iclisten import IcListenMetadataGenerator
+from pbp.json_generator.metadata_extractor import AudioFile
+
+BUCKET = "pacific-sound-256khz"
+
+
+class MockS3:
+    """
+    Mocked S3 client holding MARS files every 10 minutes, listing its keys in order
+    """
+
+    def __init__(self, start: datetime, end: datetime):
+        self.keys: List[str] = []
+        t = start
+        while t < end:
+            self.keys.append(f"{t:%m}/MARS_{t:%Y%m%d_%H%M%S}.wav")
+            t += timedelta(minutes=10)
+        self.listed_prefixes: List[str] = []
+
+    def get_paginator(self, name: str):
+        return self
+
+    def paginate(self, Bucket: str, Prefix: str):
+        assert Bucket == f"{BUCKET}-2023"
+        self.listed_prefixes.append(Prefix)
+        keys = [k for k in self.keys if k.startswith(Prefix)]
+        if not keys:
+            yield {}
+        for i in range(0, len(keys), 100):
+            yield {"Contents": [{"Key": k} for k in keys[i : i + 100]]}
+
+
+class MockWavFile(AudioFile):
+    """
+    Complete ten-minute file, without reading the header from S3
+    """
+
+    def __init__(self, path_or_url: str, start: datetime):
+        super().__init__(path_or_url, start)
+        self.duration_secs = 600
+        self.end = start + timedelta(seconds=600)
+        self.fs = 256000
+        self.channels = 1
+        self.subtype = "PCM_24"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    s3 = MockS3(datetime(2023, 7, 16, 22, 0, 7), datetime(2023, 7, 20, 2))
+    monkeypatch.setattr(gen_iclisten.boto3, "client", lambda *args, **kwargs: s3)
+    monkeypatch.setattr(gen_iclisten, "IcListenWavFile", MockWavFile)
+    return s3
+
+
+def _run(json_dir, **kwargs):
+    IcListenMetadataGenerator(
+        uri=f"s3://{BUCKET}",
+        json_base_dir=json_dir.as_posix(),
+        prefix=["MARS"],
+        start=datetime(2023, 7, 18),
+        end=datetime(2023, 7, 18),
+        seconds_per_file=600,
+        **kwargs,
+    ).run()
+
+
+def test_output_holds_only_day_file(s3, tmp_path):
+    json_dir = tmp_path / "json"
+    _run(json_dir)
+
+    assert [p for p in json_dir.rglob("*") if p.is_file()] == [
+        json_dir / "2023/20230718.json"
+    ]
+
+
+def test_listing_cache(s3, tmp_path):
+    json_dir = tmp_path / "json"
+    cache_dir = tmp_path / "cache"
+    _run(json_dir, listing_cache_dir=cache_dir.as_posix())
+
+    assert sorted(s3.listed_prefixes) == [
+        "07/MARS_20230717_",
+        "07/MARS_20230718_",
+        "07/MARS_20230719_",
+    ]
+    assert [p for p in json_dir.rglob("*") if p.is_file()] == [
+        json_dir / "2023/20230718.json"
+    ]
+    assert sorted(p.name for p in cache_dir.rglob("*") if p.is_file()) == [
+        "MARS_20230717_.listing",
+        "MARS_20230718_.listing",
+        "MARS_20230719_.listing",
+    ]
+    day_json = (json_dir / "2023/20230718.json").read_text()
+
+    # the cached listings are used in a later run
+    s3.listed_prefixes.clear()
+    _run(json_dir, listing_cache_dir=cache_dir.as_posix())
+    assert s3.listed_prefixes == []
+    assert (json_dir / "2023/20230718.json").read_text() == day_json
+
+    # unless they are too old
+    _run(json_dir, listing_cache_dir=cache_dir.as_posix(), listing_cache_max_age_days=0)
+    assert len(s3.listed_prefixes) == 3
+
+
+class SearchSpy:
+    """
+    Records the file names checked against a prefix search pattern
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.stems: List[str] = []
+
+    def search(self, stem: str):
+        self.stems.append(stem)
+        return self.pattern.search(stem)
+
+
+def test_keys_checked_cover_window_hours(s3, tmp_path):
+    generator = IcListenMetadataGenerator(
+        uri=f"s3://{BUCKET}",
+        json_base_dir=(tmp_path / "json").as_posix(),
+        prefix=["MARS"],
+        start=datetime(2023, 7, 18),
+        end=datetime(2023, 7, 18),
+        seconds_per_file=600,
+    )
+    search_re, timestamp_re = generator._prefix_patterns[0]
+    spy = SearchSpy(search_re)
+    generator._prefix_patterns = [(spy, timestamp_re)]
+    generator.run()
+
+    # the same hours as listed by the hour prefixes, 23:00 of the previous day
+    # through 00:xx of the next day
+    hour_prefixes = tuple(
+        pd.date_range(
+            datetime(2023, 7, 17, 23), datetime(2023, 7, 19), freq="h"
+        ).strftime("%m/MARS_%Y%m%d_%H")
+    )
+    expected = [k.split("/")[1][:-4] for k in s3.keys if k.startswith(hour_prefixes)]
+    assert spy.stems == expected
+    assert spy.stems[0] == "MARS_20230717_230007"
+    assert spy.stems[-1] == "MARS_20230719_005007"
+    assert len(spy.stems) == 26 * 6
@@ -0,0 +1,81 @@
+# Offline tests for the file name parsing of NRSMetadataGenerator.
+
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from loguru import logger
+
+from pbp.json_generator.gen_nrs import NRSMetadataGenerator
+
+
+@pytest.fixture
+def generator():
+    return NRSMetadataGenerator(
+        uri="gs://noaa-passive-bioacoustic/nrs/audio/11/nrs_11_2019-2021/audio",
+        json_base_dir="unused",
+        prefix=["NRS11"],
+        start=datetime(2019, 10, 24),
+        end=datetime(2019, 10, 24),
+    )
+
+
+@pytest.fixture
+def errors():
+    messages = []
+    sink_id = logger.add(messages.append, level="ERROR", format="{message}")
+    yield messages
+    logger.remove(sink_id)
+
+
+def test_parse_filenames(generator, errors):
+    paths = [
+        "gs://bucket/audio/NRS11_20191023_222607.flac",
+        "gs://bucket/audio/NRS11_20191024_022608.flac",
+        # seconds of 60 are taken as 59
+        "gs://bucket/audio/NRS11_20191024_062660.flac",
+        # not matching the prefix
+        "gs://bucket/audio/NRS12_20191024_102610.flac",
+        "gs://bucket/audio/README.txt",
+        # matching the prefix, but malformed
+        "gs://bucket/audio/NRS11_20191324_102610.flac",
+        "gs://bucket/audio/NRS11_bad.flac",
+    ]
+    flac_dts = generator._parse_filenames(paths)
+
+    assert list(flac_dts.index) == paths
+    assert list(flac_dts.iloc[:3]) == [
+        pd.Timestamp("2019-10-23 22:26:07"),
+        pd.Timestamp("2019-10-24 02:26:08"),
+        pd.Timestamp("2019-10-24 06:26:59"),
+    ]
+    assert flac_dts.iloc[3:].isna().all()
+    assert [m.strip() for m in errors] == [
+        "Could not parse NRS11_20191324_102610.flac",
+        "Could not parse NRS11_bad.flac",
+    ]
+
+
+def test_parse_filenames_in_range(generator):
+    paths = [
+        f"gs://bucket/audio/NRS11_{ts}.flac"
+        for ts in [
+            "20191023_235959",
+            "20191024_000000",
+            "20191024_120000",
+            "20191025_000000",
+            "20191025_000001",
+        ]
+    ]
+    paths.insert(2, "gs://bucket/audio/NRS12_20191024_060000.flac")
+    flac_dts = generator._parse_filenames(paths)
+
+    # the range is inclusive at both ends, and the files not matching are excluded
+    in_range = flac_dts[flac_dts.between(datetime(2019, 10, 24), datetime(2019, 10, 25))]
+    assert list(in_range.index) == [paths[1], paths[3], paths[4]]
+    assert not (flac_dts.iloc[:5] > datetime(2019, 10, 25)).any()
+    assert (flac_dts > datetime(2019, 10, 25)).any()
+
+
+def test_parse_filenames_empty(generator):
+    assert generator._parse_filenames([]).empty
@@ -1,6 +1,6 @@
 from collections import OrderedDict
 
-from pbp.metadata import parse_attributes, replace_snippets
+from pbp.metadata import parse_attributes, parse_attributes_file, replace_snippets
 
 
 def test_parse_attributes_json():
@@ -34,6 +34,26 @@ def test_parse_attributes_yaml():
     )
 
 
+def test_parse_attributes_file(tmp_path):
+    filename = tmp_path / "attrs.yaml"
+    filename.write_text("a1: Lorem ipsum\na2:\n  b1: ipsum amet.\n")
+
+    attrs = parse_attributes_file(str(filename))
+    assert attrs == {"a1": "Lorem ipsum", "a2": {"b1": "ipsum amet."}}
+
+    # modifying the result must not affect subsequent loads:
+    attrs["a1"] = "changed"
+    attrs["a2"]["b1"] = "changed"
+    assert parse_attributes_file(str(filename)) == {
+        "a1": "Lorem ipsum",
+        "a2": {"b1": "ipsum amet."},
+    }
+
+    # a modified file is re-parsed:
+    filename.write_text("a1: dolor sit\n")
+    assert parse_attributes_file(str(filename)) == {"a1": "dolor sit"}
+
+
 def test_replace_snippets():
     attributes = OrderedDict(
         {
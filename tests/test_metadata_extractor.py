@@ -0,0 +1,57 @@
+import io
+from urllib.error import HTTPError
+
+import pytest
+
+import pbp.json_generator.metadata_extractor as metadata_extractor
+
+
+def _patch_urlopen(monkeypatch, responses):
+    """
+    Makes urlopen raise or return the given responses in turn
+    """
+    calls = []
+
+    def urlopen(url):
+        calls.append(url)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return io.BytesIO(response)
+
+    monkeypatch.setattr(metadata_extractor, "urlopen", urlopen)
+    monkeypatch.setattr(metadata_extractor.time, "sleep", lambda secs: None)
+    return calls
+
+
+def _http_error(code: int) -> HTTPError:
+    return HTTPError("http://example.com/f.flac", code, "error", None, None)  # type: ignore
+
+
+def test_read_url_bytes_retries_when_rate_limited(monkeypatch):
+    calls = _patch_urlopen(
+        monkeypatch, [_http_error(429), _http_error(400), b"0123456789"]
+    )
+    assert metadata_extractor.read_url_bytes("http://example.com/f.flac", 4) == b"0123"
+    assert len(calls) == 3
+
+
+def test_read_url_bytes_gives_up(monkeypatch):
+    calls = _patch_urlopen(monkeypatch, [_http_error(503)] * 3)
+    with pytest.raises(HTTPError):
+        metadata_extractor.read_url_bytes("http://example.com/f.flac", 4, retries=3)
+    assert len(calls) == 3
+
+
+def test_read_url_bytes_does_not_retry_missing_file(monkeypatch):
+    calls = _patch_urlopen(monkeypatch, [_http_error(404), b"0123456789"])
+    with pytest.raises(HTTPError):
+        metadata_extractor.read_url_bytes("http://example.com/f.flac", 4)
+    assert len(calls) == 1
+
+
+def test_read_url_bytes_requires_an_attempt(monkeypatch):
+    calls = _patch_urlopen(monkeypatch, [b"0123456789"])
+    with pytest.raises(ValueError, match="retries must be at least 1"):
+        metadata_extractor.read_url_bytes("http://example.com/f.flac", 4, retries=0)
+    assert calls == []